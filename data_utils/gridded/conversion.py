@@ -3,18 +3,27 @@ Contains methods for converting between different file formats
 """
 
 
+import gzip
+
 import numpy
-from bisect import bisect
 
-import data_utils.gridded.grid
+from data_utils.gridded.interpolation import interpolate
 
 from stats_utils.stats import full_fields_to_ptiles
 
 
+# Size of the buffer (in bytes) used when writing output files - text files
+# are written in many small pieces, so a large buffer cuts down on the number
+# of system calls
+_WRITE_BUFFER_SIZE = 1 << 20
+# Number of lines joined together before each write to a text file
+_WRITE_CHUNK_LINES = 8192
+
+
 def fcst_bin_to_txt(bin_file, grid, fcst_ptiles,
                     desired_output_thresholds, txt_file,
                     output_threshold_type='ptile', terciles=False,
-                    output_grid=None):
+                    output_grid=None, compress=False):
     """
     Converts a forecast binary file to a text file
 
@@ -60,6 +69,9 @@ def fcst_bin_to_txt(bin_file, grid, fcst_ptiles,
     - output_grid (Grid, optional))
         - `data_utils.gridded.grid` to interpolate to before converting to a
         txt file
+    - compress (bool, optional)
+        - If True, the text file will be gzip-compressed (txt_file is used
+        as is, so it should typically end in .gz)
 
     Raises
     ------
@@ -87,101 +99,143 @@ def fcst_bin_to_txt(bin_file, grid, fcst_ptiles,
         ... terciles=True)  # doctest: +SKIP
     """
 
-    # If terciles=True, make sure there are only 2 percentiles
-    if terciles:
-        if len(desired_output_thresholds) != 2:
-            raise ValueError('To output terciles, you must pass exactly 2 '
-                             'desired thresholds')
+    # Read the forecast and extract the columns to write out
+    names, columns, output_grid = _read_fcst_columns(
+        bin_file, grid, fcst_ptiles, desired_output_thresholds,
+        terciles=terciles, output_grid=output_grid)
+
+    # Get the ids of all grid points, in the order they're written out
+    gridpoints, num_digits = _gridpoint_ids(output_grid)
+
+    # Establish the format for the grid point column and the data column(s)
+    #
+    # The grid point column is written as a single integer (x * 10 **
+    # num_digits + y), which is equivalent to zero-padding x and y
+    # separately and concatenating them. Every column is followed by 2
+    # spaces.
+    gridpoint_col_fmt = '%0' + str(2 * num_digits) + 'd'
+    data_col_fmt = '%12.5f'
+
+    # --------------------------------------------------------------------------
+    # Create a header string
+    #
+    # The word 'id' is used for the first column (which contains
+    # gridpoints). This is the typical header used in the other VWT text
+    # files.
+    #
+    # Also note that the header of each column is designed to match the
+    # length of the data in that column, so they are aligned.
+    gridpoint_col_width = len(gridpoint_col_fmt % 0)
+    data_col_width = len(data_col_fmt % 0)
+    header_string = '{:<{}s}  '.format('id', gridpoint_col_width)
+    header_string += ''.join('{:>{}s}  '.format(name, data_col_width)
+                             for name in names)
+
+    # --------------------------------------------------------------------------
+    # Write the grid points and data to the file
+    #
+    # The grid is written with x varying slowest, so the columns are flattened
+    # in Fortran order. Lines are created for a chunk of grid points at a
+    # time (each column of the chunk is formatted as a whole and the columns
+    # are then concatenated), so the text of the entire file is never held
+    # in memory.
+    columns = [column.ravel(order='F') for column in columns]
+    with _open_txt_file(txt_file, compress) as file:
+        file.write(header_string + '\n')
+        for i in range(0, gridpoints.size, _WRITE_CHUNK_LINES):
+            chunk = slice(i, i + _WRITE_CHUNK_LINES)
+            lines = numpy.char.mod(gridpoint_col_fmt + '  ', gridpoints[chunk])
+            for column in columns:
+                lines = numpy.char.add(
+                    lines, numpy.char.mod(data_col_fmt + '  ', column[chunk]))
+            _write_lines(file, lines)
 
-    # Open binary file
-    data = numpy.fromfile(bin_file, dtype='float32')
 
-    # Reshape data
-    data = numpy.reshape(data, (len(fcst_ptiles), grid.num_y, grid.num_x))
+def fcst_bin_to_npy(bin_file, grid, fcst_ptiles, desired_output_thresholds,
+                    npy_file, terciles=False, output_grid=None):
+    """
+    Converts a forecast binary file to a NumPy (.npy) file
 
-    # Interpolate, if necessary
-    if output_grid:
-        data_new = numpy.zeros((len(fcst_ptiles), output_grid.num_y, output_grid.num_x))
-        for p in range(len(fcst_ptiles)):
-            data_new[p] = data_utils.gridded.interpolation.interpolate(data[p, :, :], grid, output_grid)
-        data = data_new
-    else:
-        output_grid = grid
+    The same data written by `fcst_bin_to_txt` is saved as a structured NumPy
+    array using `numpy.save`, skipping the formatting of every value as text.
+    This is much faster for large grids when whatever reads the output can
+    use `numpy.load`.
 
-    # Make sure desired percentiles are part of the forecast percentiles
-    if set(fcst_ptiles).issuperset(set(desired_output_thresholds)):
+    The array contains one record per grid point, in the same order as the
+    text file, with the following fields:
 
-        # Find the indexes of the desired_output_thresholds within fcst_ptiles
-        fcst_ptiles.sort()
-        ptile_indexes = numpy.searchsorted(fcst_ptiles, desired_output_thresholds)
+      - id (int32) - grid point id (XXYY, etc.) as an integer
+      - prob_below, prob_normal, prob_above (float32) - if `terciles=True`
+      - ptileXX, ptileYY, etc. (float32) - if `terciles=False`
 
-        # Open the output file
-        file = open(txt_file, 'w')
+    Parameters
+    ----------
 
-        # Get the number of digits in num_x and num_y for formatting below
-        num_digits = max(len(str(output_grid.num_y)), len(str(output_grid.num_x)))
+    - bin_file (string)
+        - Binary file containing the forecast, with the dimensions (ptile x Y x
+        X)
+    - grid (Grid)
+        - Grid that the binary file maps to
+    - fcst_ptiles (list)
+        - 1-dimensional list of ptiles found in the forecast file
+    - desired_output_thresholds (list)
+        - 1-dimensional list of ptiles to include in the output file
+    - npy_file (string)
+        - NumPy file to write data to (will be overwritten)
+    - terciles (bool, optional)
+        - If True, will output tercile probabilities
+        - If False (default), will output probabilities of exceeding percentiles
+        - Can only be set when 2 percentiles are supplied
+    - output_grid (Grid, optional))
+        - `data_utils.gridded.grid` to interpolate to before converting
 
-        # Establish the format for the grid point column and the data column(s)
-        gridpoint_col_fmt = '{:0' + str(num_digits) + 'd}{:0' + str(num_digits) + 'd}'
-        data_col_fmt = '{:>12.5f}'
+    Raises
+    ------
 
-        # ----------------------------------------------------------------------
-        # Create a header string
-        #
-        # The word 'id' is used for the first column (which contains
-        # gridpoints). This is the typical header used in the other VWT text
-        # files.
-        #
-        # Also note that the header of each column is designed to match the
-        # length of the data in that column, so they are aligned.
-        header_string = ('{:<' + str(len(gridpoint_col_fmt.format(0, 0))) +
-                         's}  ').format('id')
-        if terciles:
-            header_string = ('{:<' + str(len(gridpoint_col_fmt.format(0, 0))) +
-                             's}  ').format('id')
-            for temp_str in ['prob_below', 'prob_normal', 'prob_above']:
-                header_string += ('{:>' + str(len(data_col_fmt.format(0))) +
-                                  's}  ').format(temp_str)
-        else:
-            for ptile_index in ptile_indexes:
-                header_string += ('{:>' + str(len(data_col_fmt.format(0))) +
-                                  's}  ').format('ptile{:02d}'.format(
-                    fcst_ptiles[ptile_index]))
+    - ValueError
+        - If arguments are incorrect
 
-        # Write header to file
-        file.write(header_string + '\n')
+    Examples
+    --------
+
+        #!/usr/bin/env python
+        >>> import numpy
+        >>> from data_utils.gridded.conversion import fcst_bin_to_npy
+        >>> from data_utils.gridded.grid import Grid
+        >>> from pkg_resources import resource_filename
+        >>> grid = Grid('2deg-conus')
+        >>> fcst_ptiles = [ 1,  2,  5, 10, 15,
+        ...                20, 25, 33, 40, 50,
+        ...                60, 67, 75, 80, 85,
+        ...                90, 95, 98, 99]
+        >>> desired_output_thresholds = [33, 67]
+        >>> bin_file = resource_filename('data_utils',
+        ... 'lib/example-tmean-fcst.bin')
+        >>> fcst_bin_to_npy(bin_file, grid, fcst_ptiles,
+        ... desired_output_thresholds, 'out.npy',
+        ... terciles=True)  # doctest: +SKIP
+        >>> numpy.load('out.npy')['prob_above']  # doctest: +SKIP
+    """
+    # Read the forecast and extract the columns to write out
+    names, columns, output_grid = _read_fcst_columns(
+        bin_file, grid, fcst_ptiles, desired_output_thresholds,
+        terciles=terciles, output_grid=output_grid)
+
+    # Get the ids of all grid points, in the order they're written out
+    gridpoints, _ = _gridpoint_ids(output_grid)
+
+    # Fill a structured array with the grid points and data, and save it
+    records = numpy.empty(gridpoints.size,
+                          dtype=[('id', 'i4')] + [(name, 'f4') for name in names])
+    records['id'] = gridpoints
+    for name, column in zip(names, columns):
+        records[name] = column.ravel(order='F')
+    numpy.save(npy_file, records)
 
-        # Loop over grid
-        for x in range(numpy.shape(data)[2]):
-            for y in range(numpy.shape(data)[1]):
-                # Create a data string consisting of the desired ptiles
-                if terciles:
-                    probs = []
-                    probs.append(1.0 - data[ptile_indexes[0], y, x])
-                    probs.append(data[ptile_indexes[0], y, x] -
-                                 data[ptile_indexes[1], y, x])
-                    probs.append(data[ptile_indexes[1], y, x])
-                    data_string = ''
-                    for prob in probs:
-                        data_string += (data_col_fmt + '  ').format(prob)
-                else:
-                    data_string = ''
-                    for ptile_index in ptile_indexes:
-                        data_string += (data_col_fmt + '  ').format(
-                            data[ptile_index, y, x])
-                # Write the grid point and data to the file
-                file.write((gridpoint_col_fmt + '  {}\n').format(
-                    x+1, y+1, data_string))
-
-        # Close the output file
-        file.close()
-    else:
-        raise ValueError('Desired percentiles must all be found in fcst '
-                         'percentiles')
 
 def obs_bin_to_txt(bin_file, grid, desired_output_thresholds, txt_file,
                    output_threshold_type='ptile', climo_file=None,
-                   climo_ptiles=None, output_grid=None):
+                   climo_ptiles=None, output_grid=None, compress=False):
     """
     Converts an observation binary file to a text file
 
@@ -219,6 +273,9 @@ def obs_bin_to_txt(bin_file, grid, desired_output_thresholds, txt_file,
     - output_grid (Grid, optional)
         - `data_utils.gridded.grid.Grid` to interpolate to before
         converting to a txt file
+    - compress (bool, optional)
+        - If True, the text file will be gzip-compressed (txt_file is used
+        as is, so it should typically end in .gz)
 
     Raises
     ------
@@ -269,37 +326,33 @@ def obs_bin_to_txt(bin_file, grid, desired_output_thresholds, txt_file,
     climo_data[climo_data <= -999] = numpy.nan
 
     # Make sure desired percentiles are part of the forecast percentiles
-    if set(climo_ptiles).issuperset(set(desired_output_thresholds)):
+    if numpy.isin(desired_output_thresholds, climo_ptiles).all():
 
-        # Reshape climo data
-        climo_data = numpy.reshape(climo_data, (len(climo_ptiles), grid.num_y*grid.num_x))  # Reshape data
+        # Reshape climo data to (ptiles x grid points)
+        climo_data = numpy.reshape(climo_data, (len(climo_ptiles), -1))
 
         # Convert observations to percentiles
         k = 1.343
         obs_ptile_data = 100 * full_fields_to_ptiles(obs_data, climo_data,
                                                      climo_ptiles/100, k)
 
-        # Reshape obs data
-        obs_ptile_data = numpy.reshape(obs_ptile_data, (grid.num_y, grid.num_x))  # Reshape data
-
-        # Interpolate, if necessary
-        if output_grid:
-            obs_ptile_data = data_utils.gridded.interpolation.interpolate(
-                obs_ptile_data,
-                grid,
-                output_grid)
+        # Interpolate, if necessary (obs_ptile_data is kept flat, in storage
+        # order, until it's written out)
+        if output_grid is not None:
+            obs_ptile_data = interpolate(obs_ptile_data, grid, output_grid)
         else:
             output_grid = grid
 
-        # Open the output file
-        file = open(txt_file, 'w')
-
-        # Get the number of digits in num_x and num_y for formatting below
-        num_digits = max(len(str(output_grid.num_y)), len(str(output_grid.num_x)))
+        # Get the ids of all grid points, in the order they're written out
+        gridpoints, num_digits = _gridpoint_ids(output_grid)
 
         # Establish the format for the grid point column and the data column(s)
-        gridpoint_col_fmt = '{:0' + str(num_digits) + 'd}{:0' + str(num_digits) + 'd}'
-        data_col_fmt = {'category': '{:>12.0f}', 'percentile': '{:>12.2f}'}
+        #
+        # The grid point column is written as a single integer (x * 10 **
+        # num_digits + y), which is equivalent to zero-padding x and y
+        # separately and concatenating them.
+        gridpoint_col_fmt = '%0' + str(2 * num_digits) + 'd'
+        data_col_fmt = {'category': '%12.0f', 'percentile': '%12.2f'}
 
         # ----------------------------------------------------------------------
         # Create a header string
@@ -307,30 +360,200 @@ def obs_bin_to_txt(bin_file, grid, desired_output_thresholds, txt_file,
         # The word 'id' is used for the first column (which contains
         # gridpoints). This is the typical header used in the other VWT text
         # files.
-        header_string = ('{:<' + str(len(gridpoint_col_fmt.format(0, 0))) + 's}  ').format('id')
-        for temp_str in ['category', 'percentile']:
-            header_string += ('{:>' + str(len(data_col_fmt[temp_str].format(0))) + 's}  ').format(temp_str)
-
-        # Write header to file
-        file.write(header_string + '\n')
+        gridpoint_col_width = len(gridpoint_col_fmt % 0)
+        header_string = '{:<{}s}  '.format('id', gridpoint_col_width)
+        header_string += ''.join(
+            '{:>{}s}  '.format(temp_str, len(data_col_fmt[temp_str] % 0))
+            for temp_str in ['category', 'percentile'])
 
-        # Loop over grid
-        for x in range(numpy.shape(obs_ptile_data)[1]):
-            for y in range(numpy.shape(obs_ptile_data)[0]):
-                # Create a data string consisting of the desired data columns
-                if numpy.isnan(obs_ptile_data[y, x]):
-                    data_string = (data_col_fmt['category'] + '  ' + data_col_fmt['category']).format(-999, -999)
-                else:
-                    data_string = ''
-                    data_string += (data_col_fmt['category'] + '  ').format(
-                        bisect(desired_output_thresholds, obs_ptile_data[y, x])+1)
-                    data_string += (data_col_fmt['percentile'] + '  ').format(
-                        obs_ptile_data[y, x])
-                # Write the grid point and data to the file
-                file.write((gridpoint_col_fmt + '  {}\n').format(x + 1, y + 1,
-                                                                 data_string))
-        # Close the output file
-        file.close()
+        # ----------------------------------------------------------------------
+        # Write the grid points and data to the file
+        #
+        # The grid is written with x varying slowest, so the data is
+        # reordered once here (from storage order, where y varies slowest).
+        # Lines are created for a chunk of grid points at a time, so the text
+        # of the entire file is never held in memory.
+        #
+        # Missing grid points get -999 for both columns, so only the
+        # non-missing grid points need to be categorized and formatted. The
+        # category is the number of thresholds at or below the percentile,
+        # plus 1 (same as bisect).
+        obs_ptile_data = numpy.reshape(
+            obs_ptile_data,
+            (output_grid.num_y, output_grid.num_x)).ravel(order='F')
+        missing_string = numpy.array(
+            (data_col_fmt['category'] + '  ' + data_col_fmt['category']) % (-999, -999))
+        with _open_txt_file(txt_file, compress) as file:
+            file.write(header_string + '\n')
+            for i in range(0, gridpoints.size, _WRITE_CHUNK_LINES):
+                chunk = slice(i, i + _WRITE_CHUNK_LINES)
+                missing = numpy.isnan(obs_ptile_data[chunk])
+                valid_ptile_data = obs_ptile_data[chunk][~missing]
+                categories = numpy.searchsorted(desired_output_thresholds,
+                                                valid_ptile_data,
+                                                side='right') + 1
+                valid_strings = numpy.char.add(
+                    numpy.char.mod(data_col_fmt['category'] + '  ', categories),
+                    numpy.char.mod(data_col_fmt['percentile'] + '  ',
+                                   valid_ptile_data))
+                data_strings = numpy.full(
+                    missing.shape, missing_string,
+                    dtype=numpy.promote_types(valid_strings.dtype,
+                                              missing_string.dtype))
+                data_strings[~missing] = valid_strings
+                lines = numpy.char.add(
+                    numpy.char.mod(gridpoint_col_fmt + '  ', gridpoints[chunk]),
+                    data_strings)
+                _write_lines(file, lines)
     else:
         raise ValueError('Desired percentiles must all be found in fcst '
                          'percentiles')
+
+
+def _read_fcst_columns(bin_file, grid, fcst_ptiles, desired_output_thresholds,
+                       terciles=False, output_grid=None):
+    """
+    Reads a forecast binary file and extracts the columns of data to write out
+
+    See `fcst_bin_to_txt` for a description of the parameters.
+
+    Returns
+    -------
+
+    - names (list of strings)
+        - Name of each column (prob_below, prob_normal, prob_above if
+        `terciles=True`, otherwise ptileXX, ptileYY, etc.)
+    - columns (list of array_likes)
+        - 2-dimensional (Y x X) array of data for each column
+    - output_grid (Grid)
+        - `data_utils.gridded.grid.Grid` that the columns are on
+    """
+    # If terciles=True, make sure there are only 2 percentiles
+    if terciles:
+        if len(desired_output_thresholds) != 2:
+            raise ValueError('To output terciles, you must pass exactly 2 '
+                             'desired thresholds')
+
+    # Find the indexes of the desired_output_thresholds within fcst_ptiles
+    # (fcst_ptiles are ascending), and make sure desired percentiles are part
+    # of the forecast percentiles
+    fcst_ptiles = numpy.asarray(fcst_ptiles)
+    ptile_indexes = numpy.searchsorted(fcst_ptiles, desired_output_thresholds)
+    if not numpy.array_equal(
+            fcst_ptiles[numpy.minimum(ptile_indexes, fcst_ptiles.size - 1)],
+            desired_output_thresholds):
+        raise ValueError('Desired percentiles must all be found in fcst '
+                         'percentiles')
+
+    # Memory-map the binary file, and read in only the desired ptiles - the
+    # rest of the file is never read from disk
+    data = numpy.memmap(bin_file, dtype='float32', mode='r',
+                        shape=(len(fcst_ptiles), grid.num_y, grid.num_x))
+    data = numpy.array(data[ptile_indexes])
+
+    # Interpolate, if necessary
+    if output_grid is not None:
+        # All ptiles are interpolated at once
+        data = interpolate(data, grid, output_grid)
+    else:
+        output_grid = grid
+
+    # --------------------------------------------------------------------------
+    # Name the data columns
+    #
+    if terciles:
+        names = ['prob_below', 'prob_normal', 'prob_above']
+    else:
+        names = ['ptile{:02d}'.format(fcst_ptiles[ptile_index])
+                 for ptile_index in ptile_indexes]
+
+    # --------------------------------------------------------------------------
+    # Create the data columns
+    #
+    # Each column is a 2-d (y x x) array covering the entire grid. Note that
+    # data now only contains the desired ptiles, in order.
+    if terciles:
+        # Compute the probabilities directly into a single pre-allocated
+        # array to avoid creating temporary arrays
+        probs = numpy.empty((3,) + data.shape[1:], dtype=data.dtype)
+        numpy.subtract(1.0, data[0], out=probs[0])
+        numpy.subtract(data[0], data[1], out=probs[1])
+        probs[2] = data[1]
+        columns = list(probs)
+    else:
+        columns = list(data)
+
+    return names, columns, output_grid
+
+
+def _gridpoint_ids(grid):
+    """
+    Returns the ids of all grid points, in the order they're written out
+
+    Grid point ids are formatted as XXYY (or XXXYYY, etc. for larger grids),
+    where XX and YY are the 1-based x and y indexes of the grid point. Grid
+    points are ordered with x varying slowest.
+
+    Returns
+    -------
+
+    - gridpoints (array_like)
+        - 1-dimensional array of grid point ids, as integers (XX * 10 **
+        num_digits + YY)
+    - num_digits (int)
+        - Number of digits used for each of XX and YY
+    """
+    # Get the number of digits in num_x and num_y
+    num_digits = max(len(str(grid.num_y)), len(str(grid.num_x)))
+    # The grid is written with x varying slowest, so the ids are flattened
+    # in Fortran order
+    y, x = numpy.indices((grid.num_y, grid.num_x)) + 1
+    return (x * 10 ** num_digits + y).ravel(order='F'), num_digits
+
+
+def _open_txt_file(txt_file, compress=False):
+    """
+    Opens a text file for writing, optionally gzip-compressed
+
+    Parameters
+    ----------
+
+    - txt_file (string)
+        - Text file to open (will be overwritten)
+    - compress (bool, optional)
+        - If True, the file will be gzip-compressed
+
+    Returns
+    -------
+
+    - file (file object)
+        - File opened for writing text
+    """
+    # Lines are always terminated with '\n', so newline translation is
+    # turned off. The output is plain ASCII, so the encoding is set
+    # explicitly rather than depending on the locale.
+    if compress:
+        # Compression is much slower than writing, so favor speed over size
+        return gzip.open(txt_file, 'wt', compresslevel=1, encoding='ascii',
+                         newline='\n')
+    else:
+        return open(txt_file, 'w', buffering=_WRITE_BUFFER_SIZE,
+                    encoding='ascii', newline='\n')
+
+
+def _write_lines(file, lines):
+    """
+    Writes lines of text to an open file
+
+    The lines are joined together and written at once, rather than one write
+    per line.
+
+    Parameters
+    ----------
+
+    - file (file object)
+        - Open file to write to
+    - lines (array_like)
+        - 1-dimensional array of lines (without newlines)
+    """
+    file.write('\n'.join(lines.tolist()) + '\n')
@@ -5,6 +5,8 @@ grid when calling utilities such as interpolation routines, plotting, etc.
 """
 
 
+import functools
+
 import numpy as np
 import warnings
 
@@ -20,6 +22,63 @@ def get_supported_grids():
     ]
 
 
+# Built-in grid definitions, formatted as name: (ll_corner, ur_corner, res).
+# All built-in grids are latlon grids.
+_BUILT_IN_GRIDS = {
+    '1deg-global': ((-90, 0), (90, 359), 1),
+    '2deg-global': ((-90, 0), (90, 358), 2),
+    '2.5deg-global': ((-90, 0), (90, 357.5), 2.5),
+    '2deg-conus': ((20, 230), (56, 300), 2),
+    '1/6th-deg-global': ((-89.9167, 0.0833), (89.9167, 359.9167), 1/6),
+    '0.5deg-global': ((-89.75, 0.25), (89.75, 359.75), 0.5),
+    '0.5deg-global-edge-aligned': ((-90, 0), (90, 359.5), 0.5),
+}
+# Alternate names for some of the built-in grids
+_BUILT_IN_GRIDS.update({
+    '1deg_global': _BUILT_IN_GRIDS['1deg-global'],
+    '2deg_global': _BUILT_IN_GRIDS['2deg-global'],
+    '2.5deg_global': _BUILT_IN_GRIDS['2.5deg-global'],
+    '2deg_conus': _BUILT_IN_GRIDS['2deg-conus'],
+    '1/6th_deg_global': _BUILT_IN_GRIDS['1/6th-deg-global'],
+    '0.5-deg-global-center-aligned': _BUILT_IN_GRIDS['0.5deg-global'],
+})
+
+
+@functools.lru_cache(maxsize=32)
+def _grid_coords(ll_corner, ur_corner, res):
+    """
+    Calculates the number of points and the lats and lons of a grid
+
+    Results are cached, so creating the same Grid repeatedly doesn't
+    recalculate the lats and lons. The returned arrays are shared between
+    Grids, so they are made read-only.
+
+    Parameters
+    ----------
+
+    - ll_corner (tuple of floats)
+        - Lower-left corner of the grid, formatted as (lat, lon)
+    - ur_corner (tuple of floats)
+        - Upper-right corner of the grid, formatted as (lat, lon)
+    - res (float)
+        - Resolution of the grid
+
+    Returns
+    -------
+
+    - tuple - num_y, num_x, lats, and lons of the grid
+    """
+    num_y = int(((ur_corner[0] - ll_corner[0]) / res) + 1)
+    num_x = int(((ur_corner[1] - ll_corner[1]) / res) + 1)
+    # Calculate the lats and lons from the number of points, so they always
+    # match num_y and num_x
+    lats = ll_corner[0] + res * np.arange(num_y)
+    lons = ll_corner[1] + res * np.arange(num_x)
+    lats.flags.writeable = False
+    lons.flags.writeable = False
+    return num_y, num_x, lats, lons
+
+
 class GridError(Exception):
     def __init__(self, *args, **kwargs):
         Exception.__init__(self, *args, **kwargs)
@@ -82,47 +141,9 @@ class Grid:
         '''Grid type (currently only latlon is supported)'''
 
         # Create built-in grid definitions based on name
-        if name == '1deg_global' or name == '1deg-global':
-            self.name = name
-            self.ll_corner = (-90, 0)
-            self.ur_corner = (90, 359)
-            self.res = 1
-            self.type = 'latlon'
-        elif name == '2deg_global' or name == '2deg-global':
-            self.name = name
-            self.ll_corner = (-90, 0)
-            self.ur_corner = (90, 358)
-            self.res = 2
-            self.type = 'latlon'
-        elif name == '2.5deg_global' or name == '2.5deg-global':
-            self.name = name
-            self.ll_corner = (-90, 0)
-            self.ur_corner = (90, 357.5)
-            self.res = 2.5
-            self.type = 'latlon'
-        elif name == '2deg_conus' or name == '2deg-conus':
-            self.name = name
-            self.ll_corner = (20, 230)
-            self.ur_corner = (56, 300)
-            self.res = 2
-            self.type = 'latlon'
-        elif name == '1/6th_deg_global' or name == '1/6th-deg-global':
-            self.name = name
-            self.ll_corner = (-89.9167, 0.0833)
-            self.ur_corner = (89.9167, 359.9167)
-            self.res = 1/6
-            self.type = 'latlon'
-        elif name == '0.5deg-global' or name == '0.5-deg-global-center-aligned':
-            self.name = name
-            self.ll_corner = (-89.75, 0.25)
-            self.ur_corner = (89.75, 359.75)
-            self.res = 0.5
-            self.type = 'latlon'
-        elif name == '0.5deg-global-edge-aligned':
+        if name in _BUILT_IN_GRIDS:
             self.name = name
-            self.ll_corner = (-90, 0)
-            self.ur_corner = (90, 359.5)
-            self.res = 0.5
+            self.ll_corner, self.ur_corner, self.res = _BUILT_IN_GRIDS[name]
             self.type = 'latlon'
         # Otherwise create a custom grid definition
         else:
@@ -138,16 +159,16 @@ class Grid:
             self.type = type
 
         # Calculate additional attributes
-        self.num_y = int(((self.ur_corner[0] - self.ll_corner[0]) / self.res) + 1)
+        num_y, num_x, lats, lons = _grid_coords(
+            tuple(self.ll_corner), tuple(self.ur_corner), self.res)
+        self.num_y = num_y
         '''Number of points in the y-direction'''
-        self.num_x = int(((self.ur_corner[1] - self.ll_corner[1]) / self.res) + 1)
+        self.num_x = num_x
         '''Number of points in the x-direction'''
-        self.lats = np.arange(self.ll_corner[0], self.ur_corner[0] + 0.00000001,
-                              self.res).tolist()
-        '''List of latitude values at which grid points are found'''
-        self.lons = np.arange(self.ll_corner[1], self.ur_corner[1] + 0.00000001,
-                              self.res).tolist()
-        '''List of longitude values at which grid points are found'''
+        self.lats = lats
+        '''Array of latitude values at which grid points are found'''
+        self.lons = lons
+        '''Array of longitude values at which grid points are found'''
 
 
     def print_info(self):
@@ -200,22 +221,22 @@ class Grid:
         """
         if type(latlons) is not list:
             latlons = [latlons]
-        matches = []
-        for latlon in latlons:
-            lat, lon = latlon
-            lon = 360 + lon if lon < 0 else lon
-            lats, lons = np.meshgrid(self.lats, self.lons)
-            lats = lats.reshape((self.num_y * self.num_x))
-            lons = lons.reshape((self.num_y * self.num_x))
-            try:
-                match = np.argwhere((lats == lat) & (lons == lon))[0][0]
-                if match.size == 0:
-                    matches.append(-1)
-                else:
-                    matches.append(match)
-            except IndexError:
-                matches.append(-1)
-        return matches
+        latlons = np.array(latlons, dtype=float).reshape(-1, 2)
+        lats = latlons[:, 0]
+        lons = np.where(latlons[:, 1] < 0, 360 + latlons[:, 1], latlons[:, 1])
+        # The grid is regular, so the index of the nearest grid point along
+        # each axis can be calculated directly
+        y = np.rint((lats - self.ll_corner[0]) / self.res).astype(int)
+        x = np.rint((lons - self.ll_corner[1]) / self.res).astype(int)
+        inside = (y >= 0) & (y < self.num_y) & (x >= 0) & (x < self.num_x)
+        y = np.where(inside, y, 0)
+        x = np.where(inside, x, 0)
+        # Only count it as a match if the lat/lon is actually at that grid
+        # point
+        match = inside & np.isclose(self.lats[y], lats, rtol=0, atol=1e-6) & \
+            np.isclose(self.lons[x], lons, rtol=0, atol=1e-6)
+        # Grid points are numbered with lat varying fastest
+        return np.where(match, x * self.num_y + y, -1).tolist()
 
 if __name__ == '__main__':
     grid = Grid('1deg-global')
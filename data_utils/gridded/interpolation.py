@@ -2,10 +2,10 @@
 Contains methods for interpolating gridded data.
 """
 
+import functools
+
 import numpy
-import mpl_toolkits.basemap
-from scipy import ndimage
-from scipy.ndimage.filters import gaussian_filter
+from scipy.ndimage import gaussian_filter
 import warnings
 
 
@@ -13,11 +13,17 @@ def interpolate(orig_data, orig_grid, new_grid):
     """
     Interpolates a grid from one resolution to another.
 
+    Bilinear interpolation is used. Points on the new grid that fall outside
+    of the original grid are set to NaN, as are points where any of the
+    surrounding original grid points are missing.
+
     Parameters
     ----------
 
     - orig_data (array_like)
-        - Array of original data
+        - Array of original data - either 1-dimensional (lat * lon), or
+        2-dimensional (lat x lon). Additional leading dimensions (eg. ptiles x
+        lat x lon) are interpolated all at once.
     - orig_grid (Grid)
         - Original `data_utils.gridded.grid.Grid`
     - new_grid : Grid
@@ -47,8 +53,12 @@ def interpolate(orig_data, orig_grid, new_grid):
         >>> new_data = interpolate(data, old_grid, new_grid)
     """
 
-    # If orig and new grids are the same, we're done
-    if orig_grid.name == new_grid.name:
+    # If orig and new grids are the same, we're done. The grids are compared
+    # by their definitions rather than their names, since different names
+    # can refer to the same grid, and all custom grids are named 'custom'.
+    if (tuple(orig_grid.ll_corner) == tuple(new_grid.ll_corner) and
+            tuple(orig_grid.ur_corner) == tuple(new_grid.ur_corner) and
+            orig_grid.res == new_grid.res):
         return orig_data
 
     # If data is 1-dimensional, reshape to 2 dimensions
@@ -57,42 +67,95 @@ def interpolate(orig_data, orig_grid, new_grid):
         reshape_back_to_1 = True
         orig_data = numpy.reshape(orig_data, (orig_grid.num_y, orig_grid.num_x))
 
-    # Generate arrays of longitude and latitude values for the original grid
-    num_lats, num_lons = (orig_grid.num_y, orig_grid.num_x)
-    orig_start_lat, orig_start_lon = orig_grid.ll_corner
-    orig_lons = numpy.arange(orig_start_lon,
-                             orig_start_lon + (num_lons * orig_grid.res),
-                             orig_grid.res,
-                             numpy.float32)
-    orig_lats = numpy.arange(orig_start_lat,
-                             orig_start_lat + (num_lats * orig_grid.res),
-                             orig_grid.res,
-                             numpy.float32)
-
-    # Generate mesh of longitude and latitude values for the new grid
-    new_start_lat, new_start_lon = new_grid.ll_corner
-    new_end_lat, new_end_lon = new_grid.ur_corner
-    new_lons, new_lats = numpy.meshgrid(new_grid.lons, new_grid.lats)
-
-    # Use the interp() function from mpl_toolkits.basemap to interpolate the
-    # grid to the new lat/lon values.
-    new_data = mpl_toolkits.basemap.interp(orig_data, orig_lons, orig_lats,
-                                           new_lons, new_lats, order=1,
-                                           masked=True)
-    # Extract the data portion of the MaskedArray
-    new_data = new_data.filled(numpy.nan)
+    # Do the arithmetic in the precision of the data (at least float32), so
+    # float32 data isn't upcast to float64
+    dtype = numpy.result_type(orig_data.dtype, numpy.float32)
+
+    # Missing values in a MaskedArray are treated as NaNs
+    if isinstance(orig_data, numpy.ma.MaskedArray):
+        orig_data = orig_data.astype(dtype).filled(numpy.nan)
+
+    # Get the indexes of the surrounding original grid points, and their
+    # weights, for every point on the new grid (these only depend on the
+    # grids, and are cached)
+    y0, y1, wy, y_outside = _bilinear_weights(
+        orig_grid.ll_corner[0], orig_grid.res, orig_grid.num_y,
+        new_grid.ll_corner[0], new_grid.res, new_grid.num_y)
+    x0, x1, wx, x_outside = _bilinear_weights(
+        orig_grid.ll_corner[1], orig_grid.res, orig_grid.num_x,
+        new_grid.ll_corner[1], new_grid.res, new_grid.num_x)
+    wx = wx.astype(dtype)
+    wy = wy.astype(dtype)[:, numpy.newaxis]
+
+    # Interpolate in 2 passes - first to the new lats (on the original lons),
+    # then to the new lons. This only gathers 2 rows and then 2 columns,
+    # instead of all 4 surrounding grid points at every new grid point. A
+    # missing neighbor still makes the new grid point missing. The indexing
+    # broadcasts over any leading dimensions of the data, so a stack of
+    # fields is interpolated in one pass.
+    new_data = orig_data[..., y0, :] * (1 - wy)
+    new_data += orig_data[..., y1, :] * wy
+    new_data = new_data[..., x0] * (1 - wx) + new_data[..., x1] * wx
+
+    # Points outside of the original grid are missing
+    new_data[..., y_outside, :] = numpy.nan
+    new_data[..., x_outside] = numpy.nan
 
     # If the original data was 1-dimensional, return to 1 dimension
     if reshape_back_to_1:
         new_data = numpy.reshape(new_data, (new_grid.num_y * new_grid.num_x))
 
-    # May be faster, but so far doesn't work with missing data (ex. oceans)
-    # f = interpolate.RectBivariateSpline(lats[:,1], lons[1,:], numpy.ma.masked_invalid(data), kx=1, ky=1)
-    # data_new = f(lats_new[:,1], lons_new[1,:])
-
     return new_data
 
 
+@functools.lru_cache(maxsize=32)
+def _bilinear_weights(start, res, num, new_start, new_res, new_num):
+    """
+    Locates the points of one regular axis along another regular axis
+
+    Results are cached, so repeatedly interpolating between the same grids
+    doesn't recalculate them. The returned arrays are shared between calls,
+    so they are made read-only.
+
+    Parameters
+    ----------
+
+    - start (float)
+        - First coordinate of the original axis
+    - res (float)
+        - Spacing of the original axis
+    - num (int)
+        - Number of points along the original axis
+    - new_start (float)
+        - First coordinate of the new axis
+    - new_res (float)
+        - Spacing of the new axis
+    - new_num (int)
+        - Number of points along the new axis
+
+    Returns
+    -------
+
+    - tuple of arrays - for each new coordinate, the index of the original
+    point at or below it, the index of the original point above it, the
+    weight to give the point above it, and whether the coordinate falls
+    outside of the original axis
+    """
+    # Fractional index of each new coordinate along the original axis (the
+    # new coordinates are calculated the same way as Grid.lats/Grid.lons)
+    new_coords = new_start + new_res * numpy.arange(new_num)
+    coords = (new_coords - start) / res
+    outside = (coords < 0) | (coords > num - 1)
+    coords = numpy.clip(coords, 0, num - 1)
+    # Surrounding indexes and the weight of the upper one
+    lower = coords.astype(int)
+    upper = numpy.minimum(lower + 1, num - 1)
+    weights = coords - lower
+    for array in (lower, upper, weights, outside):
+        array.flags.writeable = False
+    return lower, upper, weights, outside
+
+
 def fill_outside_mask_borders(data, passes=1):
     """
     Fill the grid points outside of the mask borders of a dataset (eg. over the
@@ -147,22 +210,65 @@ def fill_outside_mask_borders(data, passes=1):
         return data
     # If data is already a masked array, then make sure to return a masked
     # array. If not, return just the data portion
-    try:
-        data.mask
-        is_masked = True
-    except AttributeError as e:
+    is_masked = numpy.ma.isMaskedArray(data)
+    if not is_masked:
         data = numpy.ma.masked_invalid(data)
-        is_masked = False
+    # Work on plain arrays of the values and the mask, rather than on the
+    # MaskedArray itself
+    orig_mask = numpy.ma.getmaskarray(data)
+    mask = orig_mask.copy()
+    values = numpy.ma.getdata(data).copy()
+    # Buffers reused for every shift of every pass
+    shifted_mask = numpy.empty_like(mask)
+    shifted_values = numpy.empty_like(values)
+    idx = numpy.empty_like(mask)
     for _ in range(passes):
+        # Stop once there's nothing left to fill
+        if not mask.any():
+            break
         for shift in (-1, 1):
             for axis in (0, 1):
-                data_shifted = numpy.roll(data, shift=shift, axis=axis)
-                idx = ~data_shifted.mask * data.mask
-                data[idx] = data_shifted[idx]
+                # Fill the masked points whose shifted neighbor isn't masked
+                _roll_into(mask, shift, axis, shifted_mask)
+                _roll_into(values, shift, axis, shifted_values)
+                numpy.logical_not(shifted_mask, out=idx)
+                numpy.logical_and(idx, mask, out=idx)
+                numpy.copyto(values, shifted_values, where=idx)
+                numpy.logical_and(mask, shifted_mask, out=mask)
     if is_masked:
+        filled = orig_mask & ~mask
+        data[filled] = values[filled]
         return data
     else:
-        return data.data
+        return values
+
+
+def _roll_into(array, shift, axis, out):
+    """
+    Same as `numpy.roll(array, shift, axis)` for a shift of 1 or -1, but
+    writes the result into an existing array
+
+    Parameters
+    ----------
+
+    - array (array_like)
+        - Array to roll
+    - shift (int)
+        - Number of places to shift elements by (1 or -1)
+    - axis (int)
+        - Axis to roll along
+    - out (array_like)
+        - Array to write the result to (same shape as array)
+    """
+    # Make the given axis the first one, so the rest can be done for axis 0
+    array = numpy.swapaxes(array, 0, axis)
+    out = numpy.swapaxes(out, 0, axis)
+    if shift == 1:
+        out[1:] = array[:-1]
+        out[:1] = array[-1:]
+    else:
+        out[:-1] = array[1:]
+        out[-1:] = array[:1]
 
 
 def smooth(data, grid, smoothing_factor=0.5):
@@ -203,13 +309,19 @@ def smooth(data, grid, smoothing_factor=0.5):
     # Smooth the data
     #
     # Get the mask of the current data array
-    mask = numpy.ma.masked_invalid(data).mask
-    # Fill all missing values with their nearest neighbor's value so that
-    # the following Gaussian filter does not eat away the data set at the
-    # borders.
-    data = fill_outside_mask_borders(data, passes=max([grid.num_y, grid.num_x]))
-    # Apply a Gaussian filter to smooth the data
-    data = gaussian_filter(data, smoothing_factor,
-                                                 order=0, mode='nearest')
+    mask = numpy.ma.getmaskarray(numpy.ma.masked_invalid(data))
+    # Smooth the data with the missing values set to 0, and divide by the
+    # smoothed weight of the non-missing values, so that the Gaussian filter
+    # does not eat away the data set at the borders. This is equivalent to
+    # only smoothing over the non-missing values, and avoids filling every
+    # missing value with its nearest neighbor's value first.
+    dtype = numpy.result_type(data.dtype, numpy.float32)
+    values = numpy.where(mask, 0, numpy.ma.getdata(data)).astype(dtype)
+    weights = (~mask).astype(dtype)
+    values = gaussian_filter(values, smoothing_factor, order=0, mode='nearest')
+    weights = gaussian_filter(weights, smoothing_factor, order=0,
+                              mode='nearest')
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        data = values / weights
     # Reapply the mask from the initial data array
-    return numpy.where(mask, numpy.NaN, data)
+    return numpy.where(mask, numpy.nan, data)
@@ -6,14 +6,23 @@ month and day from all years between 1985 and 2010. This module is intended
 to make that much simpler.
 """
 
+import os
+import hashlib
+import uuid
+import warnings
 import numpy as np
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from .reading import read_grib
 from string_utils.strings import replace_vars_in_string
 from data_utils.units import UnitConverter
 
 
+# Default maximum number of files to read at the same time
+_DEFAULT_READ_WORKERS = 16
+
+
 class Dataset:
     """
     Object containing various components of a dataset.
@@ -24,6 +33,10 @@ class Dataset:
       - observation
       - climatology
     """
+    __slots__ = ('ens', 'ens_mean', 'ens_spread', 'obs', 'climo',
+                 'qc_ens_missing_dates', 'qc_obs_missing_dates',
+                 'qc_climo_missing_dates')
+
     def __init__(self, ens=None, ens_mean=None, ens_spread=None, obs=None,
                  climo=None, qc_ens_missing_dates=None,
                  qc_obs_missing_dates=None, qc_climo_missing_dates=None):
@@ -61,7 +74,7 @@ def load_ens_fcsts(dates, file_template, data_type, grid, num_members,
                    fhr_range, variable=None, level=None, record_num=None,
                    fhr_int=6, fhr_stat='mean', collapse=False, yrev=False,
                    remove_dup_fhrs=False, log=False, unit_conversion=None, accum_over_fhr=False,
-                   debug=False):
+                   debug=False, backing_file=None, out=None, dtype='float32'):
     """
     Loads ensemble forecast data
 
@@ -75,6 +88,10 @@ def load_ens_fcsts(dates, file_template, data_type, grid, num_members,
     If collapse==False, then the object returned will contain a single attribute
     with all the members in tact (dates, members, x * y) called ens.
 
+    Files are read in parallel, up to 16 at a time by default. This can be
+    changed with the DATA_UTILS_IO_THREADS environment variable (eg. raised
+    for file systems with high latency, such as network storage).
+
     Parameters
     ----------
 
@@ -109,19 +126,32 @@ def load_ens_fcsts(dates, file_template, data_type, grid, num_members,
     - unit_conversion - *string* (optional) - type of unit conversion to perform. If None,
     then no unit conversion will be performed.
     - debug - *boolean* - if True the file data is loaded from will be printed out
+    - backing_file - *string* (optional) - file to store the data in (as a
+    NumPy memmap) instead of memory, for data too large to fit in memory (only
+    used if `collapse=False`). Any existing file is overwritten.
+    - out - *array_like* (optional) - array (dates x members x gridpoints) to
+    store the data in, rather than allocating a new one (only used if
+    `collapse=False`). It must have a floating point dtype.
+    - dtype - *string* (optional) - data type of the returned arrays (default:
+    float32, the data type of the files)
 
     Returns
     -------
 
-    If `collapse=True`, a tuple of 2 NumPy arrays will be returned (ensemble
-    mean and ensemble spread). For example:
+    If `collapse=True`, a Dataset object with the attributes 'ens_mean' and
+    'ens_spread' set to arrays of the ensemble mean and ensemble spread
+    (dates x gridpoint) will be returned. For example:
 
         >>> dataset = load_ens_fcsts(..., collapse=True)  # doctest: +SKIP
 
-    If `collapse=False`, a single NumPy array will be returned. For example:
+    If `collapse=False`, a Dataset object with the attribute 'ens' set to an
+    array of the ensemble members (dates x members x gridpoint) will be
+    returned. For example:
 
         >>> dataset = load_ens_fcsts(..., collapse=False))  # doctest: +SKIP
 
+    The arrays are float32, unless a different `dtype` is given.
+
     Examples
     --------
 
@@ -161,153 +191,205 @@ def load_ens_fcsts(dates, file_template, data_type, grid, num_members,
     if not isinstance(dates, list):
         dates = [dates]
     # --------------------------------------------------------------------------
+    # Get the list of fhrs to load
+    #
+    fhrs = list(range(fhr_range[0], fhr_range[1] + 1, fhr_int))
+    # Note that if accum_over_fhr=True, only the first and last fhr will be
+    # loaded. When a variable is accumulated over forecast hour in a grib file
+    # (such as ECENS precip), only the first and last values are needed to
+    # calculate the total accumulation over the given fhr period.
+    fhr_indexes = [f for f in range(len(fhrs))
+                   if not (accum_over_fhr and (0 < f < len(fhrs) - 1))]
+    # --------------------------------------------------------------------------
+    # Format the fhrs and members for the file template
+    #
+    # These are the same for every date, so they're only formatted once
+    fhr_strs = ['{:03d}'.format(fhrs[f]) for f in fhr_indexes]
+    member_strs = ['{:02d}'.format(m) for m in range(num_members)]
+    # Grep for the fhr hour in case there are any duplicate grib records (same
+    # var, different fhr)
+    if remove_dup_fhrs:
+        grep_fhrs = [':anl' if fhrs[f] == 0 else
+                     '({:d} hour|{:d}hr)'.format(fhrs[f], fhrs[f])
+                     for f in fhr_indexes]
+    else:
+        grep_fhrs = [None] * len(fhr_indexes)
+    # --------------------------------------------------------------------------
+    # Get what to divide the total across fhr by (and what to divide the
+    # accumulation by if accum_over_fhr=True)
+    #
+    if fhr_stat == 'mean':
+        fhr_mean = True
+        accum_divisor = len(fhrs)
+    elif fhr_stat == 'sum':
+        fhr_mean = False
+        accum_divisor = 1
+    else:
+        raise ValueError('Supported fhr_stat values: mean, sum')
+    # --------------------------------------------------------------------------
     # Initialize data arrays
     #
-    with np.errstate(invalid='ignore'):
-        data_f = np.empty(
-            (len(range(fhr_range[0], fhr_range[1] + 1, fhr_int)), grid.num_y
-             * grid.num_x)
-        ) * np.nan
-    # If collapse==True, then we need a temp data_m array to store the
-    # separate ensemble members before averaging, and we need mean and spread
-    # arrays
+    # The stat across fhr is accumulated as each fhr is read, so only the
+    # number of valid values at each point needs to be stored, rather than
+    # every fhr
+    fhr_count = np.empty(grid.num_y * grid.num_x, dtype=int)
+    # If collapse==True, then we need mean and spread arrays. The ensemble mean
+    # and spread are updated as each member is loaded, so only a single
+    # member (data_m) and the running count, mean, and sum of squared
+    # differences from the mean at each point need to be stored, rather than
+    # every member. The running mean and sum of squares are kept in double
+    # precision, since they're updated once per member.
     if collapse:
-        data_m = np.empty((num_members, grid.num_y * grid.num_x)) * np.nan
-        ens_mean = np.empty((len(dates), grid.num_y * grid.num_x)) * np.nan
-        ens_spread = np.empty((len(dates), grid.num_y * grid.num_x)) * np.nan
+        data_m = np.empty(grid.num_y * grid.num_x, dtype=dtype)
+        ens_count = np.empty(grid.num_y * grid.num_x, dtype=int)
+        ens_running_mean = np.empty(grid.num_y * grid.num_x)
+        ens_running_m2 = np.empty(grid.num_y * grid.num_x)
+        ens_mean = np.full((len(dates), grid.num_y * grid.num_x), np.nan,
+                           dtype=dtype)
+        ens_spread = np.full((len(dates), grid.num_y * grid.num_x), np.nan,
+                             dtype=dtype)
     # If collapse==False, then we need a single data array to store the
     # separate ensemble members
     else:
-        data = np.empty((len(dates), num_members, grid.num_y * grid.num_x))
+        data = _empty((len(dates), num_members, grid.num_y * grid.num_x),
+                      dtype=dtype, backing_file=backing_file, out=out)
     # --------------------------------------------------------------------------
-    # Loop over dates
+    # Read the data files
     #
-    for d, date in enumerate(dates):
-        date_obj = datetime.strptime(date, '%Y%m%d')
+    # Each member/fhr is in a separate file, so the files are read
+    # concurrently - most of the time is spent waiting on the file system (or
+    # wgrib), not in Python. One pool of threads is used for the whole load,
+    # and the next member's files (the first member of the next date, for
+    # the last member of a date) are read while the current member is being
+    # processed.
+    def read_member_files(date_file_template, m):
+        # Convert file template to real files (one per fhr)
+        files = []
+        for fhr in fhr_strs:
+            var_dict = {'fhr': fhr, 'member': member_strs[m]}
+            file = replace_vars_in_string(date_file_template, **var_dict)
+            if debug:
+                print('Loading data from {}'.format(file))
+            files.append(file)
+        # Start reading the files
+        return executor.map(
+            lambda file, grep_fhr: _read_fcst_file(
+                file, data_type, grid, variable, level, grep_fhr=grep_fhr,
+                yrev=yrev),
+            files, grep_fhrs)
+
+    # The date portion of the file template only depends on the date
+    date_file_templates = [
+        datetime.strftime(datetime.strptime(date, '%Y%m%d'), file_template)
+        for date in dates]
+
+    with ThreadPoolExecutor(max_workers=_read_workers()) as executor:
+        if dates:
+            next_file_data = read_member_files(date_file_templates[0], 0)
         # ----------------------------------------------------------------------
-        # Loop over members
+        # Loop over dates
         #
-        for m in range(num_members):
-            member = '{:02d}'.format(m)
+        for d in range(len(dates)):
+            if collapse:
+                ens_count[:] = 0
+                ens_running_mean[:] = 0
+                ens_running_m2[:] = 0
             # ------------------------------------------------------------------
-            # Loop over fhr
-            #
+            # Loop over members
             #
-            # Note that if accum_over_fhr=True, only the first and last fhr will be loaded. When a
-            # variable is accumulated over forecast hour in a grib file (such as ECENS precip),
-            # only the first and last values are needed to calculate the total accumulation over
-            # the given fhr period.
-            for f, fhr in enumerate(range(fhr_range[0], fhr_range[1]+1,
-                                          fhr_int)):
-                if accum_over_fhr and (0 < f < len(range(fhr_range[0], fhr_range[1] + 1,
-                                                         fhr_int)) - 1):
-                    continue
-                # Grep for the fhr hour in case there are any duplicate grib
-                # records (same var, different fhr)
-                if remove_dup_fhrs:
-                    grep_fhr = ':anl' if fhr == 0 else '({:d} hour|{:d}hr)'.format(fhr, fhr)
-                else:
-                    grep_fhr = None
-                fhr = '{:03d}'.format(fhr)
+            for m in range(num_members):
+                file_data = next_file_data
+                if m + 1 < num_members:
+                    next_file_data = read_member_files(date_file_templates[d],
+                                                       m + 1)
+                elif d + 1 < len(dates):
+                    next_file_data = read_member_files(
+                        date_file_templates[d + 1], 0)
                 # --------------------------------------------------------------
-                # Convert file template to real file
+                # Calculate stat (mean, total) across fhr
                 #
-                file = datetime.strftime(date_obj, file_template)
-                var_dict = {'fhr': fhr, 'member': member}
-                file = replace_vars_in_string(file, **var_dict)
-                if debug:
-                    print('Loading data from {}'.format(file))
-                # --------------------------------------------------------------
-                # Read data file
+                # If accum_over_fhr=True, the first fhr is subtracted from the
+                # last. Otherwise the valid values of each fhr are added up as
+                # they're read.
                 #
-                # grib1 or grib2
-                if data_type in ['grib1', 'grib2']:
-                    # Open file and read the appropriate data
-                    try:
-                        # Read in one forecast hour, one member
-                        data_f[f] = read_grib(file, data_type, variable,
-                                              level, grep_fhr=grep_fhr,
-                                              grid=grid, yrev=yrev)
-                    except OSError:
-                        data_f[f] = np.nan
-                elif data_type == 'bin':
-                    # Open file and read the appropriate data
-                    try:
-                        # Read in one forecast hour, one member
-                        data_f[f] = np.fromfile(file, dtype='float32')
-                    except:
-                        data_f[f] = np.nan
+                data_stat = data_m if collapse else data[d, m]
+                data_stat[:] = 0
+                fhr_count[:] = 0
+                for i, row in enumerate(file_data):
+                    if row is None:
+                        row = np.nan
+                    # ----------------------------------------------------------
+                    # Convert units (if necessary)
+                    #
+                    if unit_conversion:
+                        uc = UnitConverter()
+                        conversion = unit_conversion
+                        row = uc.convert(row, conversion)
+                    if accum_over_fhr:
+                        if i == 0:
+                            np.negative(row, out=data_stat)
+                        if i == len(fhr_indexes) - 1:
+                            data_stat += row
+                    else:
+                        missing = np.isnan(row)
+                        # Most of the time nothing is missing, so the row can
+                        # be added as is
+                        if missing.any():
+                            data_stat += np.where(missing, 0, row)
+                            fhr_count += ~missing
+                        else:
+                            data_stat += row
+                            fhr_count += 1
+                # Points with no valid values for any fhr are set to NaN (for a
+                # total, only if the whole member is missing)
+                if accum_over_fhr:
+                    data_stat /= accum_divisor
+                elif fhr_mean:
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        data_stat /= fhr_count
+                elif not fhr_count.any():
+                    data_stat[:] = np.nan
                 # --------------------------------------------------------------
-                # Convert units (if necessary)
+                # Add the member to the ensemble mean and spread (if
+                # collapse==True)
+                #
+                # Note that the log of the forecast is taken if log == True
                 #
-                if unit_conversion:
-                    uc = UnitConverter()
-                    conversion = unit_conversion
-                    data_f[f] = uc.convert(data_f[f], conversion)
+                if collapse:
+                    if log:
+                        # Assuming a minimum log value of -2, set vals of < 1mm
+                        # to 0.14 (exp(-2))
+                        data_m[data_m < 1] = 0.14
+                        np.log(data_m, out=data_m)
+                    _update_mean_m2(data_m, ens_count, ens_running_mean,
+                                    ens_running_m2)
+
             # ------------------------------------------------------------------
-            # Calculate stat (mean, total) across fhr
+            # Calculate ensemble mean and spread (if collapse==True)
             #
-            if fhr_stat == 'mean':
-                if collapse:
-                    if np.all(np.isnan(data_f)):
-                        data_m[m] = np.empty(data_f.shape[1]) * np.nan
-                    else:
-                        if accum_over_fhr:
-                            data_m[m] = (data_f[-1] - data_f[0]) / data_f.shape[0]
-                        else:
-                            data_m[m] = np.nanmean(data_f, axis=0)
-                else:
-                    if np.all(np.isnan(data_f)):
-                        data[d, m] = np.empty(data_f.shape[1]) * np.nan
-                    else:
-                        if accum_over_fhr:
-                            data[d, m] = (data_f[-1] - data_f[0]) / data_f.shape[0]
-                        else:
-                            data[d, m] = np.nanmean(data_f, axis=0)
-            elif fhr_stat == 'sum':
-                if collapse:
-                    if np.all(np.isnan(data_f)):
-                        data_m[m] = np.empty(data_f.shape[1]) * np.nan
-                    else:
-                        if accum_over_fhr:
-                            data_m[m] = data_f[-1] - data_f[0]
-                        else:
-                            data_m[m] = np.nansum(data_f, axis=0)
-                else:
-                    if np.all(np.isnan(data_f)):
-                        data[d, m] = np.empty(data_f.shape[1]) * np.nan
-                    else:
-                        if accum_over_fhr:
-                            data[d, m] = data_f[-1] - data_f[0]
-                        else:
-                            data[d, m] = np.nansum(data_f, axis=0)
+            # TODO: Add QCing
+            # import pdb ; pdb.set_trace()
+            if collapse:
+                # Points with no valid members are set to NaN
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    ens_running_m2 /= ens_count
+                np.sqrt(ens_running_m2, out=ens_running_m2)
+                ens_running_mean[ens_count == 0] = np.nan
+                ens_mean[d] = ens_running_mean
+                ens_spread[d] = ens_running_m2
             else:
-                raise ValueError('Supported fhr_stat values: mean, sum')
+                # Write each date to the backing file as it's finished
+                if isinstance(data, np.memmap):
+                    data.flush()
 
-        # ----------------------------------------------------------------------
-        # Calculate ensemble mean and spread (if collapse==True)
-        #
-        # Note that the log of the forecast is taken if log == True
-        #
-        # TODO: Add QCing
-        # import pdb ; pdb.set_trace()
-        if collapse:
-            if np.all(np.isnan(data_m)):
-                ens_mean[d] = np.empty(data_m.shape[1]) * np.nan
-                ens_spread[d] = np.empty(data_m.shape[1]) * np.nan
-            else:
-                if log:
-                    # Assuming a minimum log value of -2, set vals of < 1mm to
-                    # 0.14 (exp(-2))
-                    data_m = np.where(data_m < 1, 0.14, data_m)
-                    ens_mean[d] = np.nanmean(np.log(data_m), axis=0)
-                    ens_spread[d] = np.nanstd(np.log(data_m), axis=0)
-                else:
-                    ens_mean[d] = np.nanmean(data_m, axis=0)
-                    ens_spread[d] = np.nanstd(data_m, axis=0)
-        else:
-            if log:
-                data = np.log(data)
+    # --------------------------------------------------------------------------
+    # Take the log of the forecast (if collapse==False - the log is taken
+    # before the ensemble mean and spread are calculated otherwise)
+    #
+    if log and not collapse:
+        np.log(data, out=data)
+        if isinstance(data, np.memmap):
+            data.flush()
 
     # --------------------------------------------------------------------------
     # Return the data
@@ -318,8 +400,86 @@ def load_ens_fcsts(dates, file_template, data_type, grid, num_members,
         return Dataset(ens=data)
 
 
+def _read_workers():
+    """
+    Returns the maximum number of files to read at the same time
+
+    This is set with the DATA_UTILS_IO_THREADS environment variable (which
+    can be raised for file systems with high latency, eg. network storage),
+    and is read each time data is loaded. If it isn't a number, a warning is
+    raised and the default of 16 is used. Values below 1 are treated as 1.
+    """
+    value = os.environ.get('DATA_UTILS_IO_THREADS')
+    if value is None:
+        return _DEFAULT_READ_WORKERS
+    try:
+        return max(int(value), 1)
+    except ValueError:
+        warnings.warn('DATA_UTILS_IO_THREADS must be an integer (got {!r}), '
+                      'using {}'.format(value, _DEFAULT_READ_WORKERS))
+        return _DEFAULT_READ_WORKERS
+
+
+def _update_mean_m2(values, count, mean, m2):
+    """
+    Adds values to a running mean and sum of squared differences from the
+    mean, ignoring NaNs
+
+    Welford's algorithm is used, so the values don't need to be stored to
+    calculate the mean and standard deviation (sqrt(m2 / count)) later.
+
+    Parameters
+    ----------
+
+    - values - *array_like* - values to add (eg. gridpoints)
+    - count - *array_like* - number of values added so far (updated in place)
+    - mean - *array_like* - mean of the values added so far (updated in place)
+    - m2 - *array_like* - sum of squared differences from the mean of the
+    values added so far (updated in place)
+    """
+    valid = ~np.isnan(values)
+    count += valid
+    delta = np.where(valid, values - mean, 0)
+    mean += delta / np.maximum(count, 1)
+    m2 += delta * np.where(valid, values - mean, 0)
+
+
+def _read_fcst_file(file, data_type, grid, variable=None, level=None,
+                    grep_fhr=None, yrev=False):
+    """
+    Reads the data for a single member and fhr for `load_ens_fcsts`
+
+    See `load_ens_fcsts` for a description of the parameters.
+
+    Returns
+    -------
+
+    - array_like, NaN, or None
+        - Data for the given file, NaN if the file couldn't be read, or None
+        if the data type isn't supported
+    """
+    # grib1 or grib2
+    if data_type in ['grib1', 'grib2']:
+        # Open file and read the appropriate data
+        try:
+            # Read in one forecast hour, one member
+            return read_grib(file, data_type, variable, level,
+                             grep_fhr=grep_fhr, grid=grid, yrev=yrev)
+        except OSError:
+            return np.nan
+    elif data_type == 'bin':
+        # Open file and read the appropriate data
+        try:
+            # Read in one forecast hour, one member
+            return np.fromfile(file, dtype='float32').reshape(
+                grid.num_y * grid.num_x)
+        except:
+            return np.nan
+
+
 def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False, yrev=False,
-             variable=None, level=None, unit_conversion=None):
+             variable=None, level=None, unit_conversion=None, backing_file=None,
+             out=None, dtype='float32', cache_dir=None):
     """
     Load observation data
 
@@ -328,6 +488,10 @@ def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False
     record (multiple variables), you can specify the record number
     using the `record_num` parameter.
 
+    Files are read in parallel, up to 16 at a time by default. This can be
+    changed with the DATA_UTILS_IO_THREADS environment variable (eg. raised
+    for file systems with high latency, such as network storage).
+
     Parameters
     ----------
 
@@ -338,13 +502,26 @@ def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False
     - data_type - *string* - input data type (bin, grib1, grib2)
     - grid - *Grid* - Grid associated with the input data
     - record_num - *int* - binary record containing the desired variable
+    (defaults to the first record)
     - debug - *boolean* - if True the file data is loaded from will be printed out
+    - backing_file - *string* (optional) - file to store the data in (as a
+    NumPy memmap) instead of memory, for data too large to fit in memory. Any
+    existing file is overwritten.
+    - out - *array_like* (optional) - array (dates x gridpoints) to store the
+    data in, rather than allocating a new one. It must have a floating point
+    dtype.
+    - dtype - *string* (optional) - data type of the returned array (default:
+    float32, the data type of the files)
+    - cache_dir - *string* (optional) - directory to cache grib records in (as
+    .npy files), so loading the same obs again doesn't need to call wgrib. A
+    cached record is only used while the grib file is unchanged.
 
     Returns
     -------
 
     Dataset object with the attribute 'obs' set to an array of observation
-    data (dates x gridpoint)
+    data (dates x gridpoint). The array is float32, unless a different `dtype`
+    is given.
 
     Examples
     --------
@@ -368,14 +545,13 @@ def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False
     # --------------------------------------------------------------------------
     # Initialize a NumPy array to store the data
     #
-    data = np.empty((len(dates), grid.num_y * grid.num_x))
+    data = _empty((len(dates), grid.num_y * grid.num_x), dtype=dtype,
+                  backing_file=backing_file, out=out)
     # --------------------------------------------------------------------------
-    # Loop over dates
+    # Convert file template to real files
     #
-    for d, date in enumerate(dates):
-        # ----------------------------------------------------------------------
-        # Convert file template to real file
-        #
+    files = []
+    for date in dates:
         if len(date) == 8:
             fmt = '%Y%m%d'
         elif len(date) == 10:
@@ -386,30 +562,19 @@ def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False
         file = datetime.strftime(date_obj, file_template)
         if debug:
             print('Loading data from {}'.format(file))
-        # --------------------------------------------------------------
-        # Read data file
-        #
-        # grib1 or grib2
-        if data_type in ['grib1', 'grib2']:
-            # Open file and read the appropriate data
-            try:
-                # Read in one forecast hour, one member
-                data[d] = read_grib(file, data_type, variable, level, grid=grid, yrev=yrev,
-                                    debug=debug)
-            except OSError:
-                data[d] = np.nan
-        elif data_type == 'binary':
-            # Open file and read the appropriate data
-            try:
-                # Load data
-                data_temp = np.fromfile(file, dtype='float32')
-                print(data_temp.size, record_num)
-                # Determine number of records in the binary file
-                num_records = data_temp.size / (grid.num_y * grid.num_x)
-                # Reshape data and extract the appropriate record
-                data[d] = data_temp.reshape(num_records, grid.num_y * grid.num_x)[record_num]
-            except:
-                data[d] = np.nan
+        files.append(file)
+    # --------------------------------------------------------------------------
+    # Read data files
+    #
+    # Each date is in a separate file, so the files are read concurrently -
+    # most of the time is spent waiting on the file system (or wgrib), not in
+    # Python. Each file is read directly into its row of the data array.
+    with ThreadPoolExecutor(max_workers=_read_workers()) as executor:
+        list(executor.map(
+            lambda file, row: _read_obs_file(file, row, data_type, grid,
+                                             record_num, variable, level, yrev,
+                                             debug, cache_dir),
+            files, data))
 
     # -------------------------------------------------------------------------
     # Convert units (if necessary)
@@ -417,7 +582,9 @@ def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False
     if unit_conversion:
         uc = UnitConverter()
         conversion = unit_conversion
-        data = uc.convert(data, conversion)
+        data[:] = uc.convert(data, conversion)
+    if isinstance(data, np.memmap):
+        data.flush()
 
     # --------------------------------------------------------------------------
     # Return data
@@ -425,12 +592,200 @@ def load_obs(dates, file_template, data_type, grid, record_num=None, debug=False
     return Dataset(obs=data)
 
 
-def load_climos(days, file_template, grid, debug=False):
+def _read_obs_file(file, out, data_type, grid, record_num=None,
+                   variable=None, level=None, yrev=False, debug=False,
+                   cache_dir=None):
+    """
+    Reads the data for a single date for `load_obs`
+
+    See `load_obs` for a description of the other parameters.
+
+    Parameters
+    ----------
+
+    - file - *string* - file to read
+    - out - *array_like* - array (gridpoints) to read the data into. It's set
+    to NaN if the file couldn't be read, and left alone if the data type isn't
+    supported.
+    """
+    # grib1 or grib2
+    if data_type in ['grib1', 'grib2']:
+        # Open file and read the appropriate data
+        try:
+            if cache_dir is not None:
+                cache_file = _grib_cache_file(cache_dir, file, variable, level,
+                                              yrev)
+                if _load_cached_record(cache_file, out):
+                    return
+            # Read in one forecast hour, one member
+            out[:] = read_grib(file, data_type, variable, level, grid=grid,
+                               yrev=yrev, debug=debug)
+        except OSError:
+            out[:] = np.nan
+            return
+        # Failing to cache the record doesn't affect the data that was read
+        if cache_dir is not None:
+            try:
+                _save_cached_record(cache_file, out)
+            except OSError as e:
+                warnings.warn('Unable to cache grib record from {}: {}'.format(
+                    file, e))
+    elif data_type == 'binary':
+        # Open file and read the appropriate record
+        try:
+            _read_binary_record(file, out,
+                                0 if record_num is None else record_num)
+        except:
+            out[:] = np.nan
+
+
+def _grib_cache_file(cache_dir, file, variable, level, yrev):
+    """
+    Returns the name of the .npy file a grib record is cached in
+
+    The name is a hash of the grib file (including its modification time),
+    and the record read from it, so a cached record isn't used once the grib
+    file changes.
+
+    Exceptions
+    ----------
+
+    - OSError - if the grib file doesn't exist
+    """
+    key = '{}:{}:{}:{}:{}'.format(os.path.abspath(file),
+                                  os.stat(file).st_mtime_ns, variable, level,
+                                  yrev)
+    return os.path.join(cache_dir,
+                        hashlib.sha256(key.encode()).hexdigest() + '.npy')
+
+
+def _load_cached_record(cache_file, out):
+    """
+    Reads a cached grib record into out
+
+    Returns
+    -------
+
+    - *boolean* - whether there was a usable cached record
+    """
+    try:
+        record = np.load(cache_file, mmap_mode='r')
+    except (OSError, ValueError):
+        return False
+    if record.size != out.size:
+        return False
+    out[:] = record
+    return True
+
+
+def _save_cached_record(cache_file, data):
+    """
+    Saves a grib record to the cache
+
+    The record is written to a temporary file first and then moved into
+    place, so a partially-written record is never read from the cache.
+
+    Exceptions
+    ----------
+
+    - OSError - if the record couldn't be written (the temporary file is
+    removed first)
+    """
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = '{}.{}.tmp'.format(cache_file, uuid.uuid4())
+    try:
+        with open(temp_file, 'wb') as f:
+            np.save(f, data)
+        os.replace(temp_file, cache_file)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+
+
+def _read_binary_record(file, out, record_num=0):
+    """
+    Reads a record from a float32 binary file directly into an array
+
+    Only the given record is read, rather than the whole file, and it's read
+    straight into `out` (if `out` is a float32 array) without an intermediate
+    array.
+
+    Parameters
+    ----------
+
+    - file - *string* - binary file to read
+    - out - *array_like* - array to read the record into - the record is the
+    size of this array
+    - record_num - *int* - record to read
+
+    Exceptions
+    ----------
+
+    - OSError - if the file couldn't be read
+    - ValueError - if the file doesn't contain the record
+    """
+    # The files are float32, so they can only be read straight into float32
+    # arrays
+    if out.dtype == np.float32 and out.flags.c_contiguous:
+        record = out
+    else:
+        record = np.empty(out.shape, dtype='float32')
+    with open(file, 'rb') as f:
+        f.seek(record_num * record.nbytes)
+        if f.readinto(record) != record.nbytes:
+            raise ValueError('{} is missing record {}'.format(file, record_num))
+    if record is not out:
+        out[...] = record
+
+
+def _empty(shape, dtype='float32', backing_file=None, out=None):
+    """
+    Creates an uninitialized array, either in memory or backed by a file, or
+    checks an array given by the caller
+
+    Parameters
+    ----------
+
+    - shape - *tuple* - shape of the array
+    - dtype - *string* - data type of the array
+    - backing_file - *string* (optional) - file to store the array in (as a
+    NumPy memmap). If None, the array is stored in memory.
+    - out - *array_like* (optional) - existing array to use instead of
+    creating one. It must have the given shape and a floating point dtype
+    (missing data is stored as NaN), but needn't have the given dtype.
+
+    Returns
+    -------
+
+    - *NumPy array* or *NumPy memmap* - the new array (or out)
+    """
+    if out is not None:
+        if backing_file is not None:
+            raise ValueError('Only one of backing_file and out can be given')
+        if out.shape != shape:
+            raise ValueError('out must have the shape {}'.format(shape))
+        if not np.issubdtype(out.dtype, np.floating):
+            raise ValueError('out must have a floating point dtype')
+        return out
+    elif backing_file is None:
+        return np.empty(shape, dtype=dtype)
+    else:
+        return np.memmap(backing_file, dtype=dtype, mode='w+', shape=shape)
+
+
+def load_climos(days, file_template, grid, debug=False, dtype='float32',
+                backing_file=None, out=None):
     """
     Load climatology data
 
     Data is loaded for a given range of days of the year. Currently the data
-    must be in binary format with the dimensions (ptiles x gridpoints)
+    must be in binary format with the dimensions (ptiles x gridpoints). The
+    number of ptiles is determined from the size of the first file, and every
+    other file must be the same size. Days whose file is missing are set to
+    NaN.
 
     Parameters
     ----------
@@ -442,12 +797,21 @@ def load_climos(days, file_template, grid, debug=False):
     the given date.
     - grid - *Grid* - Grid associated with the input data
     - debug - *boolean* - if True the file data is loaded from will be printed out
+    - dtype - *string* (optional) - data type of the returned array (default:
+    float32, the data type of the files)
+    - backing_file - *string* (optional) - file to store the data in (as a
+    NumPy memmap) instead of memory, for data too large to fit in memory. Any
+    existing file is overwritten.
+    - out - *array_like* (optional) - array (days x ptiles x gridpoints) to
+    store the data in, rather than allocating a new one. It must have a
+    floating point dtype.
 
     Returns
     -------
 
     Dataset object containing an attribute 'climo' containing an array of
-    climatology data (days x ptiles x gridpoint)
+    climatology data (days x ptiles x gridpoint). The array is float32, unless
+    a different `dtype` is given.
 
     Examples
     --------
@@ -470,13 +834,13 @@ def load_climos(days, file_template, grid, debug=False):
     # --------------------------------------------------------------------------
     # Initialize a NumPy array to store the data
     #
-    # Open first file to determine num ptiles
+    # Get the size of the first file to determine num ptiles
     date_obj = datetime.strptime('2000' + days[0], '%Y%m%d')
     file = datetime.strftime(date_obj, file_template)
-    data = np.fromfile(file, 'float32')
-    num_ptiles = int(data.size / (grid.num_y * grid.num_x))
+    num_ptiles = int(os.path.getsize(file) / 4 / (grid.num_y * grid.num_x))
     # Initialize empty NumPy array
-    data = np.empty((len(days), num_ptiles, grid.num_y * grid.num_x))
+    data = _empty((len(days), num_ptiles, grid.num_y * grid.num_x),
+                  dtype=dtype, backing_file=backing_file, out=out)
     # --------------------------------------------------------------------------
     # Loop over dates
     #
@@ -489,11 +853,16 @@ def load_climos(days, file_template, grid, debug=False):
         # ----------------------------------------------------------------------
         # Open file and read the appropriate data
         #
+        # Every file must have the same number of ptiles as the first one
         try:
-            data[d] = np.fromfile(file, 'float32').reshape(
-                num_ptiles, grid.num_y * grid.num_x)
+            if os.path.getsize(file) != data[d].size * 4:
+                raise ValueError('{} does not contain {} ptiles'.format(
+                    file, num_ptiles))
+            _read_binary_record(file, data[d])
         except FileNotFoundError:
             data[d] = np.nan
+    if isinstance(data, np.memmap):
+        data.flush()
     # --------------------------------------------------------------------------
     # Return data
     #
@@ -20,7 +20,6 @@ from data_utils.gridded.interpolation import fill_outside_mask_borders
 from data_utils.gridded.interpolation import smooth
 import warnings
 
-print(mpl_toolkits.basemap.__file__)
 # ------------------------------------------------------------------------------
 # Setup reusable docstring
 #
@@ -189,14 +188,10 @@ def _make_plot(*args, **kwargs):
             raise ValueError('The number of fill_colors must be 1 greater than the '
                              'number of levels')
 
-    # Convert the ll_corner and res to arrays of lons and lats
-    start_lat, start_lon = grid.ll_corner
-    end_lat, end_lon = grid.ur_corner
-    lats = np.arange(start_lat, end_lat + grid.res, grid.res)
-    lons = np.arange(start_lon, end_lon + grid.res, grid.res)
-
-    # Create a 2-d mesh array of lons and lats for pyplot
-    lons, lats = np.meshgrid(lons, lats)
+    # Create a 2-d mesh array of lons and lats for pyplot. The Grid's lats and
+    # lons are used rather than a float arange between the corners, which can
+    # end up with one point more or less than the data.
+    lons, lats = np.meshgrid(grid.lons, grid.lats)
 
     # Create Basemap
     fig, ax = matplotlib.pyplot.subplots()
@@ -0,0 +1,58 @@
+from data_utils.gridded import conversion
+from data_utils.gridded.grid import Grid
+import data_utils
+import gzip
+import os
+import numpy as np
+
+
+lib_dir = os.path.join(os.path.dirname(data_utils.__file__), 'lib')
+fcst_file = os.path.join(lib_dir, 'example-tmean-fcst.bin')
+obs_file = os.path.join(lib_dir, 'example-tmean-obs.bin')
+climo_file = os.path.join(lib_dir, 'example-tmean-clim.bin')
+fcst_ptiles = [1, 2, 5, 10, 15, 20, 25, 33, 40, 50, 60, 67, 75, 80, 85, 90,
+               95, 98, 99]
+
+
+def test_fcst_bin_to_npy(tmpdir):
+    """Test that fcst_bin_to_npy saves the same data as fcst_bin_to_txt"""
+    grid = Grid('2deg-conus')
+    txt_file = str(tmpdir.join('fcst.txt'))
+    npy_file = str(tmpdir.join('fcst.npy'))
+    conversion.fcst_bin_to_txt(fcst_file, grid, fcst_ptiles, [33, 67],
+                               txt_file, terciles=True)
+    conversion.fcst_bin_to_npy(fcst_file, grid, fcst_ptiles, [33, 67],
+                               npy_file, terciles=True)
+    with open(txt_file) as f:
+        names = f.readline().split()
+    txt_data = np.loadtxt(txt_file, skiprows=1)
+    npy_data = np.load(npy_file)
+    # The fields should match the columns of the text file
+    assert list(npy_data.dtype.names) == names
+    assert names == ['id', 'prob_below', 'prob_normal', 'prob_above']
+    assert npy_data.size == grid.num_y * grid.num_x
+    assert np.array_equal(npy_data['id'], txt_data[:, 0])
+    for i, name in enumerate(names[1:], start=1):
+        assert np.allclose(npy_data[name], txt_data[:, i], atol=5e-6,
+                           equal_nan=True)
+
+
+def test_compress(tmpdir):
+    """Test that compressed text files contain the same text"""
+    grid = Grid('2deg-conus')
+    for compress in [False, True]:
+        conversion.fcst_bin_to_txt(
+            fcst_file, grid, fcst_ptiles, [33, 67],
+            str(tmpdir.join('fcst-{}.txt'.format(compress))), terciles=True,
+            compress=compress)
+        conversion.obs_bin_to_txt(
+            obs_file, grid, [33, 67],
+            str(tmpdir.join('obs-{}.txt'.format(compress))),
+            climo_file=climo_file, climo_ptiles=fcst_ptiles,
+            compress=compress)
+    for name in ['fcst', 'obs']:
+        with open(str(tmpdir.join('{}-False.txt'.format(name))), 'rb') as f:
+            text = f.read()
+        with gzip.open(str(tmpdir.join('{}-True.txt'.format(name)))) as f:
+            assert f.read() == text
+        assert len(text) > 0
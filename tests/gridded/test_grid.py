@@ -48,3 +48,16 @@ def test_assert_correct_grid():
     test_grid = Grid('1deg-global')
     with raises(GridError):
         test_grid.assert_correct_grid(1)
+
+
+def test_latlon_to_gridpoint():
+    """Tests the latlon_to_gridpoint() function"""
+    grid = Grid('1deg-global')
+    # Grid points are numbered with lat varying fastest
+    assert grid.latlon_to_gridpoint((-90, 0)) == [0]
+    assert grid.latlon_to_gridpoint([(0, 180), (-89, 1)]) == \
+        [180 * grid.num_y + 90, grid.num_y + 1]
+    # Negative lons should be converted to 0-360
+    assert grid.latlon_to_gridpoint((0, -1)) == [359 * grid.num_y + 90]
+    # Lat/lons not on the grid should return -1
+    assert grid.latlon_to_gridpoint([(0.5, 0), (91, 0)]) == [-1, -1]
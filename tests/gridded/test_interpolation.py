@@ -31,6 +31,28 @@ def test_interpolation():
     data1 = np.random.rand(grid1.num_y, grid1.num_x)
     data2 = interpolation.interpolate(data1, grid1, grid2)
     assert data1.ndim == data2.ndim
+    # Make sure a stack of 2-d inputs is interpolated the same as each 2-d
+    # input individually
+    grid1 = Grid(get_supported_grids()[0])
+    grid2 = Grid(get_supported_grids()[1])
+    data1 = np.random.rand(3, grid1.num_y, grid1.num_x)
+    data2 = interpolation.interpolate(data1, grid1, grid2)
+    assert data2.shape == (3, grid2.num_y, grid2.num_x)
+    for i in range(3):
+        np.testing.assert_array_equal(
+            data2[i], interpolation.interpolate(data1[i], grid1, grid2))
+    # Make sure grids with the same definition aren't interpolated, and
+    # different custom grids are
+    grid1 = Grid('1deg-global')
+    grid2 = Grid(ll_corner=grid1.ll_corner, ur_corner=grid1.ur_corner,
+                 res=grid1.res)
+    data1 = np.random.rand(grid1.num_y, grid1.num_x)
+    assert interpolation.interpolate(data1, grid1, grid2) is data1
+    grid1 = Grid(ll_corner=(0, 0), ur_corner=(10, 10), res=1)
+    grid2 = Grid(ll_corner=(0, 0), ur_corner=(10, 10), res=2)
+    data1 = np.random.rand(grid1.num_y, grid1.num_x)
+    data2 = interpolation.interpolate(data1, grid1, grid2)
+    assert data2.shape == (grid2.num_y, grid2.num_x)
 
 
 def test_fill_outside_borders():
@@ -52,6 +74,15 @@ def test_fill_outside_borders():
     test_array = np.empty((5, 5)) * np.nan
     output_array = interpolation.fill_outside_mask_borders(test_array)
     assert np.all(np.isnan(output_array))
+    # Make sure each pass fills 1 extra layer of grid points
+    test_array = np.full((5, 5), np.nan)
+    test_array[2, 2] = 1
+    output_array = interpolation.fill_outside_mask_borders(test_array)
+    assert np.isnan(output_array[0]).all()
+    assert np.all(output_array[1:4, 1:4] == 1)
+    output_array = interpolation.fill_outside_mask_borders(test_array,
+                                                           passes=2)
+    assert np.all(output_array == 1)
 
 
 def test_smooth():
@@ -1,5 +1,8 @@
 from data_utils.gridded import loading, grid
 import uuid
+import warnings
+import numpy as np
+from pytest import raises, warns
 
 
 def test_load_obs():
@@ -59,3 +62,269 @@ def test_load_ens_fcsts():
     fhr_range = (150, 150)
     loading.load_ens_fcsts(dates, file_template, data_type, test_grid,
                            num_members, fhr_range)
+
+
+def test_load_ens_fcsts_stats(tmpdir):
+    """
+    Test the ensemble mean and spread, and members, returned by load_ens_fcsts
+    """
+    dates = ['20120101', '20120102']
+    test_grid = grid.Grid('2deg-conus')
+    num_points = test_grid.num_y * test_grid.num_x
+    num_members = 3
+    fhrs = [0, 6, 12]
+    file_template = str(tmpdir.join('fcst_%Y%m%d_f{fhr}_m{member}.bin'))
+    # Write a file for every date, member, and fhr (values are between 0.5
+    # and 10, so some are below 1 when taking the log)
+    rng = np.random.RandomState(0)
+    data = rng.uniform(0.5, 10, (len(dates), num_members, len(fhrs),
+                                 num_points)).astype('float32')
+    # Some points are missing for one fhr, and one point is missing for every
+    # fhr of a member
+    data[0, 0, 1, :10] = np.nan
+    data[1, 1, :, 20] = np.nan
+    for d, date in enumerate(dates):
+        for m in range(num_members):
+            for f, fhr in enumerate(fhrs):
+                # One fhr of a member, and every fhr of another member, are
+                # missing
+                if (d, m, f) == (0, 1, 2) or (d, m) == (1, 2):
+                    data[d, m, f] = np.nan
+                    continue
+                file = file_template.replace('%Y%m%d', date).format(
+                    fhr='{:03d}'.format(fhr), member='{:02d}'.format(m))
+                data[d, m, f].tofile(file)
+    # Mean across fhr of each member, ignoring missing data
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        members = np.nanmean(data, axis=2)
+    log_members = np.log(np.where(members < 1, 0.14, members))
+    # Compare the ensemble mean and spread to NumPy's, with and without the
+    # log of the forecast
+    for log, expected in [(False, members), (True, log_members)]:
+        dataset = loading.load_ens_fcsts(dates, file_template, 'bin',
+                                         test_grid, num_members,
+                                         (fhrs[0], fhrs[-1]), collapse=True,
+                                         log=log)
+        assert np.allclose(dataset.ens_mean, np.nanmean(expected, axis=1),
+                           rtol=1e-5, equal_nan=True)
+        assert np.allclose(dataset.ens_spread, np.nanstd(expected, axis=1),
+                           rtol=1e-5, atol=1e-6, equal_nan=True)
+    # The log should only be taken once when the members are returned
+    dataset = loading.load_ens_fcsts(dates, file_template, 'bin', test_grid,
+                                     num_members, (fhrs[0], fhrs[-1]),
+                                     log=True)
+    assert np.allclose(dataset.ens, np.log(members), rtol=1e-5,
+                       equal_nan=True)
+    assert np.array_equal(np.isnan(dataset.ens), np.isnan(members))
+    # Storing the members in a backing file or a given array should give the
+    # same data as storing them in memory (the log is taken in place)
+    for log in [False, True]:
+        expected = loading.load_ens_fcsts(dates, file_template, 'bin',
+                                          test_grid, num_members,
+                                          (fhrs[0], fhrs[-1]), log=log).ens
+        backing_file = str(tmpdir.join('ens-{}.dat'.format(log)))
+        dataset = loading.load_ens_fcsts(dates, file_template, 'bin',
+                                         test_grid, num_members,
+                                         (fhrs[0], fhrs[-1]), log=log,
+                                         backing_file=backing_file)
+        assert isinstance(dataset.ens, np.memmap)
+        assert dataset.ens.filename == backing_file
+        assert np.array_equal(dataset.ens, expected, equal_nan=True)
+        assert np.array_equal(
+            np.fromfile(backing_file, dtype='float32').reshape(expected.shape),
+            expected, equal_nan=True)
+        out = np.zeros(expected.shape, dtype='float32')
+        dataset = loading.load_ens_fcsts(dates, file_template, 'bin',
+                                         test_grid, num_members,
+                                         (fhrs[0], fhrs[-1]), log=log, out=out)
+        assert dataset.ens is out
+        assert np.array_equal(out, expected, equal_nan=True)
+
+
+def test_load_obs_binary(tmpdir):
+    """
+    Test load_obs function reading records from binary files
+    """
+    dates = ['20120101', '20120102']
+    test_grid = grid.Grid('2deg-conus')
+    num_points = test_grid.num_y * test_grid.num_x
+    # Write a file with 3 records for each date
+    records = np.random.rand(len(dates), 3, num_points).astype('float32')
+    for d, date in enumerate(dates):
+        records[d].tofile(str(tmpdir.join('obs_{}.bin'.format(date))))
+    file_template = str(tmpdir.join('obs_%Y%m%d.bin'))
+    # Should read the given record
+    dataset = loading.load_obs(dates, file_template, 'binary', test_grid,
+                               record_num=1)
+    assert dataset.obs.dtype == np.float32
+    assert np.array_equal(dataset.obs, records[:, 1])
+    # Should read the first record by default
+    dataset = loading.load_obs(dates, file_template, 'binary', test_grid)
+    assert np.array_equal(dataset.obs, records[:, 0])
+    # Should read the record into an array of a different dtype
+    dataset = loading.load_obs(dates, file_template, 'binary', test_grid,
+                               record_num=2, dtype='float64')
+    assert dataset.obs.dtype == np.float64
+    assert np.array_equal(dataset.obs, records[:, 2])
+    # Should set the data to NaN if the record isn't in the file
+    dataset = loading.load_obs(dates, file_template, 'binary', test_grid,
+                               record_num=3)
+    assert np.all(np.isnan(dataset.obs))
+
+
+def test_load_obs_backing_file(tmpdir):
+    """
+    Test load_obs function with the data stored in a backing file
+    """
+    # Should store the data in the backing file (the second date is missing)
+    dates = ['20120101', '20120102']
+    test_grid = grid.Grid('1deg-global')
+    obs = np.random.rand(test_grid.num_y * test_grid.num_x).astype('float32')
+    obs.tofile(str(tmpdir.join('obs_20120101.bin')))
+    file_template = str(tmpdir.join('obs_%Y%m%d.bin'))
+    data_type = 'binary'
+    backing_file = str(tmpdir.join('obs.dat'))
+    dataset = loading.load_obs(dates, file_template, data_type, test_grid,
+                               backing_file=backing_file)
+    assert dataset.obs.filename == backing_file
+    assert dataset.obs.shape == (2, test_grid.num_y * test_grid.num_x)
+    data = np.fromfile(backing_file, dtype='float32').reshape(2, -1)
+    assert np.array_equal(data[0], obs)
+    assert np.all(np.isnan(data[1]))
+
+
+def test_load_obs_out():
+    """
+    Test load_obs function with a caller-provided output array
+    """
+    dates = ['20120101', '20120102']
+    file_template = str(uuid.uuid4())
+    data_type = 'binary'
+    test_grid = grid.Grid('1deg-global')
+    # Should store the data in the given array
+    out = np.zeros((2, test_grid.num_y * test_grid.num_x))
+    dataset = loading.load_obs(dates, file_template, data_type, test_grid,
+                               out=out)
+    assert dataset.obs is out
+    assert np.all(np.isnan(out))
+    # Should raise a ValueError if the array is the wrong shape
+    out = np.zeros((3, test_grid.num_y * test_grid.num_x))
+    with raises(ValueError):
+        loading.load_obs(dates, file_template, data_type, test_grid, out=out)
+    # Should raise a ValueError if the array isn't floating point
+    out = np.zeros((2, test_grid.num_y * test_grid.num_x), dtype=int)
+    with raises(ValueError):
+        loading.load_obs(dates, file_template, data_type, test_grid, out=out)
+
+
+def test_load_obs_cache_dir(tmpdir, monkeypatch):
+    """
+    Test load_obs function with grib records cached in a directory
+    """
+    test_grid = grid.Grid('2deg-conus')
+    num_points = test_grid.num_y * test_grid.num_x
+    # Replace read_grib so no grib files or wgrib are needed
+    calls = []
+
+    def read_grib(file, *args, **kwargs):
+        calls.append(file)
+        return np.arange(num_points, dtype='float32')
+    monkeypatch.setattr(loading, 'read_grib', read_grib)
+    dates = ['20120101', '20120102']
+    for date in dates:
+        tmpdir.join('obs_{}.grb2'.format(date)).write('')
+    file_template = str(tmpdir.join('obs_%Y%m%d.grb2'))
+    cache_dir = str(tmpdir.join('cache'))
+    # Should only read each grib file once
+    for _ in range(2):
+        dataset = loading.load_obs(dates, file_template, 'grib2', test_grid,
+                                   variable='TMP', level='2 m above ground',
+                                   cache_dir=cache_dir)
+        assert np.all(dataset.obs == np.arange(num_points))
+    assert len(calls) == 2
+
+
+def test_load_obs_unwritable_cache_dir(tmpdir, monkeypatch):
+    """
+    Test load_obs function when grib records can't be written to the cache
+    """
+    test_grid = grid.Grid('2deg-conus')
+    num_points = test_grid.num_y * test_grid.num_x
+    # Replace read_grib so no grib files or wgrib are needed
+    monkeypatch.setattr(loading, 'read_grib',
+                        lambda *args, **kwargs: np.arange(num_points,
+                                                          dtype='float32'))
+    dates = ['20120101', '20120102']
+    for date in dates:
+        tmpdir.join('obs_{}.grb2'.format(date)).write('')
+    file_template = str(tmpdir.join('obs_%Y%m%d.grb2'))
+    # The cache directory is a file, so nothing can be written to it
+    cache_dir = str(tmpdir.join('cache'))
+    tmpdir.join('cache').write('')
+    # The records read should still be returned
+    with warns(UserWarning):
+        dataset = loading.load_obs(dates, file_template, 'grib2', test_grid,
+                                   variable='TMP', level='2 m above ground',
+                                   cache_dir=cache_dir)
+    assert np.all(dataset.obs == np.arange(num_points))
+
+
+def test_load_obs_io_threads(monkeypatch):
+    """
+    Test load_obs function with DATA_UTILS_IO_THREADS set to bad values
+    """
+    dates = ['20120101', '20120102']
+    file_template = '/some/fake/file_%Y%m%d.bin'
+    test_grid = grid.Grid('2deg-conus')
+    # Values below 1 should be treated as 1
+    monkeypatch.setenv('DATA_UTILS_IO_THREADS', '0')
+    dataset = loading.load_obs(dates, file_template, 'binary', test_grid)
+    assert np.all(np.isnan(dataset.obs))
+    # Values that aren't numbers should fall back to the default
+    monkeypatch.setenv('DATA_UTILS_IO_THREADS', 'abc')
+    with warns(UserWarning):
+        dataset = loading.load_obs(dates, file_template, 'binary', test_grid)
+    assert np.all(np.isnan(dataset.obs))
+
+
+def test_load_climos(tmpdir):
+    """
+    Test load_climos function
+    """
+    days = ['0101', '0102', '0103']
+    test_grid = grid.Grid('2deg-conus')
+    num_points = test_grid.num_y * test_grid.num_x
+    num_ptiles = 4
+    # Write a file for the first 2 days (the last day is missing)
+    climos = np.random.rand(2, num_ptiles, num_points).astype('float32')
+    for d, day in enumerate(days[:2]):
+        climos[d].tofile(str(tmpdir.join('climo_{}.bin'.format(day))))
+    file_template = str(tmpdir.join('climo_%m%d.bin'))
+    dataset = loading.load_climos(days, file_template, test_grid)
+    assert dataset.climo.shape == (3, num_ptiles, num_points)
+    assert dataset.climo.dtype == np.float32
+    assert np.array_equal(dataset.climo[:2], climos)
+    assert np.all(np.isnan(dataset.climo[2]))
+    # Should raise a ValueError if a file has a different number of ptiles
+    np.random.rand(num_ptiles + 1, num_points).astype('float32').tofile(
+        str(tmpdir.join('climo_0103.bin')))
+    with raises(ValueError):
+        loading.load_climos(days, file_template, test_grid)
+    # Should store the data in the backing file
+    backing_file = str(tmpdir.join('climo.dat'))
+    climos[1].tofile(str(tmpdir.join('climo_0103.bin')))
+    dataset = loading.load_climos(days, file_template, test_grid,
+                                  backing_file=backing_file)
+    assert isinstance(dataset.climo, np.memmap)
+    assert dataset.climo.filename == backing_file
+    assert np.array_equal(dataset.climo, climos[[0, 1, 1]])
+    # Should store the data in the given array
+    out = np.zeros((3, num_ptiles, num_points), dtype='float32')
+    dataset = loading.load_climos(days, file_template, test_grid, out=out)
+    assert dataset.climo is out
+    assert np.array_equal(out, climos[[0, 1, 1]])
+    # Should raise a ValueError if the array is the wrong shape
+    out = np.zeros((3, num_ptiles + 1, num_points), dtype='float32')
+    with raises(ValueError):
+        loading.load_climos(days, file_template, test_grid, out=out)